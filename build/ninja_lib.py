@@ -5,6 +5,7 @@ ninja_lib.py
 Runtime options:
 
   CXXFLAGS     Additional flags to pass to the C++ compiler
+  NINJA_QUIET  Suppress log() diagnostics, and the string formatting they do
 
 Notes on ninja_syntax.py:
 
@@ -30,7 +31,12 @@ import os
 import sys
 
 
+NINJA_QUIET = bool(os.getenv('NINJA_QUIET'))
+
+
 def log(msg, *args):
+  if NINJA_QUIET:  # don't even pay for the % formatting
+    return
   if args:
     msg = msg % args
   print(msg, file=sys.stderr)
@@ -79,19 +85,41 @@ SMALL_TEST_MATRIX = [
 ]
 
 
+# Caches for ConfigDir() and ObjPath().  The same few configs are formatted
+# for every source file of every binary, so don't redo the string work.
+_CONFIG_DIR_CACHE = {}  # config -> str
+_OBJ_PATH_CACHE = {}  # (src_path, config) -> str
+
+
 def ConfigDir(config):
-  compiler, variant, more_cxx_flags = config
-  if more_cxx_flags is None:
-    return '%s-%s' % (compiler, variant)
-  else:
-    # -D CPP_UNIT_TEST -> D_CPP_UNIT_TEST
-    flags_str = more_cxx_flags.replace('-', '').replace(' ', '_')
-    return '%s-%s-%s' % (compiler, variant, flags_str)
+  result = _CONFIG_DIR_CACHE.get(config)
+  if result is None:
+    compiler, variant, more_cxx_flags = config
+    # Concatenation is faster than % formatting, and this is all string args
+    if more_cxx_flags is None:
+      result = compiler + '-' + variant
+    else:
+      # -D CPP_UNIT_TEST -> D_CPP_UNIT_TEST
+      flags_str = more_cxx_flags.replace('-', '').replace(' ', '_')
+      result = compiler + '-' + variant + '-' + flags_str
+    _CONFIG_DIR_CACHE[config] = result
+  return result
 
 
 def ObjPath(src_path, config):
-  rel_path, _ = os.path.splitext(src_path)
-  return '_build/obj/%s/%s.o' % (ConfigDir(config), rel_path)
+  key = (src_path, config)
+  result = _OBJ_PATH_CACHE.get(key)
+  if result is None:
+    rel_path, _ = os.path.splitext(src_path)
+    result = '_build/obj/' + ConfigDir(config) + '/' + rel_path + '.o'
+    _OBJ_PATH_CACHE[key] = result
+  return result
+
+
+# Shared sentinel for omitted implicit= / deps= / generated_headers= args.
+# It's NEVER mutated (consumers copy before extending), so every rule can
+# alias it instead of allocating a fresh [].
+_EMPTY_LIST = []
 
 
 # Used namedtuple since it doesn't have any state
@@ -121,12 +149,19 @@ class CcLibrary(object):
     # implicit dep in Ninja, while the latter can rely on the .d mechanism.
     self.generated_headers = generated_headers
 
-    self.obj_lookup = {}  # config -> list of objects
-    self.preprocessed_lookup = {}  # config -> boolean
+    self.obj_lookup = {}  # ConfigDir() string -> list of objects
+    self.preprocessed_lookup = {}  # ConfigDir() string -> boolean
+
+    self.implicit_cache = None  # computed at most once, by _CalculateImplicit
 
   def _CalculateImplicit(self, ru):
     """ Compile actions for cc_library() also need implicit deps on generated headers"""
 
+    # The result doesn't depend on the config, so compute it once, not per
+    # (config, preprocessed) combination.
+    if self.implicit_cache is not None:
+      return self.implicit_cache
+
     out_deps = set()
     ru._TransitiveClosure(self.label, self.deps, out_deps)
     unique_deps = sorted(out_deps)
@@ -135,10 +170,17 @@ class CcLibrary(object):
     for label in unique_deps:
       cc_lib = ru.cc_libs[label]
       implicit.extend(cc_lib.generated_headers)
+
+    self.implicit_cache = implicit
     return implicit
 
   def MaybeWrite(self, ru, config, preprocessed):
-    if config not in self.obj_lookup:  # already written by some other cc_binary()
+    # Key by the ConfigDir() string, not the config tuple.  ConfigDir() always
+    # returns the same cached string object for a config, so the dict lookups
+    # hash a single interned-style key instead of a 3-tuple.
+    config_key = ConfigDir(config)
+
+    if config_key not in self.obj_lookup:  # already written by some other cc_binary()
       implicit = self._CalculateImplicit(ru)
 
       objects = []
@@ -147,16 +189,16 @@ class CcLibrary(object):
         ru.compile(obj, src, self.deps, config, implicit=implicit)
         objects.append(obj)
 
-      self.obj_lookup[config] = objects
+      self.obj_lookup[config_key] = objects
 
-    if preprocessed and config not in self.preprocessed_lookup:
+    if preprocessed and config_key not in self.preprocessed_lookup:
       implicit = self._CalculateImplicit(ru)
 
       for src in self.srcs:
         # no output needed
         ru.compile('', src, self.deps, config, implicit=implicit,
                    maybe_preprocess=True)
-      self.preprocessed_lookup[config] = True
+      self.preprocessed_lookup[config_key] = True
 
 
 class Rules(object):
@@ -200,24 +242,87 @@ class Rules(object):
     self.cc_binary_deps = {}  # main_cc -> list of LABELS
     self.phony = {}  # list of phony targets
 
+    # label -> set of labels, memoized transitive closure.  Valid because a
+    # CcLibrary and its deps are immutable once defined.
+    self.closure_cache = {}
+
   def AddPhony(self, phony_to_add):
     self.phony.update(phony_to_add)
 
   def WritePhony(self):
-    for name in sorted(self.phony):
+    # The sort only exists to keep build.ninja deterministic.  Subgraphs tend
+    # to add phony targets in order already, so check before sorting.
+    names = list(self.phony)
+    need_sort = False
+    for i in range(len(names) - 1):
+      if names[i] > names[i + 1]:
+        need_sort = True
+        break
+    if need_sort:
+      names.sort()
+
+    for name in names:
       targets = self.phony[name]
       if targets:
         self.n.build([name], 'phony', targets)
         self.n.newline()
 
   def WriteRules(self):
+    # Every cc_library() is defined by now, so resolve all the dep closures
+    # with one pass over the graph instead of a DFS per binary.
+    self._PrecomputeClosures()
     for cc_bin in self.cc_bins:
       self.WriteCcBinary(cc_bin)
 
+  def _PrecomputeClosures(self):
+    """Fill closure_cache for all labels, visiting each label exactly once.
+
+    Labels are processed in reverse-topological order (deps first), so each
+    closure is the union of already-computed dep closures.  Labels with
+    undefined deps are skipped here; _LabelClosure() reports those with the
+    name of the binary that pulled them in, which is a better error.
+    """
+    visited = set()  # labels whose deps were already pushed
+    for root in self.cc_libs:
+      if root in self.closure_cache:
+        continue
+      stack = [(root, False)]
+      while len(stack):
+        label, deps_done = stack.pop()
+
+        if deps_done:
+          cc_lib = self.cc_libs[label]
+          closure = set()
+          closure.add(label)
+          ok = True
+          for dep in cc_lib.deps:
+            if dep == label:  # hnode.asdl depends on itself
+              continue
+            dep_closure = self.closure_cache.get(dep)
+            if dep_closure is None:  # undefined, or part of a cycle
+              ok = False
+              break
+            closure.update(dep_closure)
+          if ok:
+            self.closure_cache[label] = closure
+          continue
+
+        if label in self.closure_cache or label in visited:
+          continue
+        cc_lib = self.cc_libs.get(label)
+        if cc_lib is None:  # undefined
+          continue
+
+        visited.add(label)
+        stack.append((label, True))
+        for dep in cc_lib.deps:
+          if dep not in self.closure_cache and dep not in visited:
+            stack.append((dep, False))
+
   def compile(self, out_obj, in_cc, deps, config, implicit=None, maybe_preprocess=False):
     """ .cc -> compiler -> .o """
 
-    implicit = implicit or []
+    implicit = implicit or _EMPTY_LIST
 
     compiler, variant, more_cxx_flags = config
     if more_cxx_flags is None:
@@ -226,7 +331,8 @@ class Rules(object):
       assert "'" not in more_cxx_flags, more_cxx_flags  # can't handle single quotes
       flags_str = "'%s'" % more_cxx_flags
 
-    v = [('compiler', compiler), ('variant', variant), ('more_cxx_flags', flags_str)]
+    # tuple, not list: it's only iterated by ninja_syntax, never mutated
+    v = (('compiler', compiler), ('variant', variant), ('more_cxx_flags', flags_str))
     if maybe_preprocess:
       # Limit it to certain configs
       if more_cxx_flags is None and variant in ('dbg', 'opt'):
@@ -244,15 +350,16 @@ class Rules(object):
     assert isinstance(out_bin, str), out_bin
     assert isinstance(main_obj, str), main_obj
 
+    config_key = ConfigDir(config)
+
     objects = [main_obj]
     for label in deps:
-      key = (label, compiler, variant)
       try:
         cc_lib = self.cc_libs[label]
       except KeyError:
         raise RuntimeError("Couldn't resolve label %r" % label)
 
-      o = cc_lib.obj_lookup[config]
+      o = cc_lib.obj_lookup[config_key]
       objects.extend(o)
 
     v = [('compiler', compiler), ('variant', variant)]
@@ -280,9 +387,9 @@ class Rules(object):
     if srcs is None:
       raise RuntimeError('cc_library %r requires srcs' % label)
 
-    implicit = implicit or []
-    deps = deps or []
-    generated_headers = generated_headers or []
+    implicit = implicit or _EMPTY_LIST
+    deps = deps or _EMPTY_LIST
+    generated_headers = generated_headers or _EMPTY_LIST
 
     if label in self.cc_libs:
       raise RuntimeError('%s was already defined' % label)
@@ -297,14 +404,37 @@ class Rules(object):
     for label in deps:
       if label in unique_out:
         continue
-      unique_out.add(label)
+      unique_out.update(self._LabelClosure(name, label))
+
+  def _LabelClosure(self, name, label):
+    """Iterative worklist version, so deep dep chains can't hit the Python
+    recursion limit.  Returns the memoized closure INCLUDING label itself."""
+    cached = self.closure_cache.get(label)
+    if cached is not None:
+      return cached
+
+    closure = set()
+    to_visit = [label]
+    while len(to_visit):
+      current = to_visit.pop()
+      if current in closure:
+        continue
+
+      cached = self.closure_cache.get(current)
+      if cached is not None:
+        closure.update(cached)
+        continue
 
       try:
-        cc_lib = self.cc_libs[label]
+        cc_lib = self.cc_libs[current]
       except KeyError:
-        raise RuntimeError('Undefined label %s in %s' % (label, name))
+        raise RuntimeError('Undefined label %s in %s' % (current, name))
 
-      self._TransitiveClosure(cc_lib.label, cc_lib.deps, unique_out)
+      closure.add(current)
+      to_visit.extend(cc_lib.deps)
+
+    self.closure_cache[label] = closure
+    return closure
 
   def cc_binary(self, main_cc,
       symlinks = None,
@@ -315,9 +445,9 @@ class Rules(object):
       preprocessed = False,
       top_level = False,
       ):
-    symlinks = symlinks or []
-    implicit = implicit or []
-    deps = deps or []
+    symlinks = symlinks or _EMPTY_LIST
+    implicit = implicit or _EMPTY_LIST
+    deps = deps or _EMPTY_LIST
     if not matrix:
       raise RuntimeError("Config matrix required")
 
@@ -336,9 +466,11 @@ class Rules(object):
     # save for SourcesForBinary()
     self.cc_binary_deps[c.main_cc] = unique_deps
 
+    # Resolve each label once, instead of once per config below
+    dep_libs = [self.cc_libs[label] for label in unique_deps]  # should exist
+
     compile_imp = list(c.implicit)
-    for label in unique_deps:
-      cc_lib = self.cc_libs[label]  # should exit
+    for cc_lib in dep_libs:
       # compile actions of binaries that have ASDL label deps need the
       # generated header as implicit dep
       compile_imp.extend(cc_lib.generated_headers)
@@ -347,9 +479,7 @@ class Rules(object):
       if len(config) == 2:
         config = (config[0], config[1], None)
 
-      for label in unique_deps:
-        cc_lib = self.cc_libs[label]  # should exit
-
+      for cc_lib in dep_libs:
         cc_lib.MaybeWrite(self, config, c.preprocessed)
 
       # Compile main object, maybe with IMPLICIT headers deps
@@ -137,6 +137,7 @@ main() {
 ''', file=f)
 
   objects = []
+  compile_lines = []
   for src in sorted(cc_sources):
     # e.g. _build/obj/cxx-dbg-sh/posix.o
     base_name, _ = os.path.splitext(os.path.basename(src))
@@ -144,8 +145,11 @@ main() {
     obj_quoted = '"_build/obj/$compiler-$variant-sh/%s.o"' % base_name
     objects.append(obj_quoted)
 
-    print('  _compile_one "$compiler" "$variant" "" \\', file=f)
-    print('    %s %s' % (src, obj_quoted), file=f)
+    compile_lines.append('  _compile_one "$compiler" "$variant" "" \\\n')
+    compile_lines.append('    %s %s\n' % (src, obj_quoted))
+
+  # one write() for all the _compile_one invocations, not 2 per source file
+  f.write(''.join(compile_lines))
 
   print('', file=f)
 
@@ -273,10 +277,9 @@ def main(argv):
   except IndexError:
     action = 'ninja'
 
-  if action == 'ninja':
-    f = open(BUILD_NINJA, 'w')
-  else:
-    f = cStringIO.StringIO()  # thrown away
+  # Buffer the whole file in memory: ninja_syntax.Writer makes a lot of tiny
+  # write() calls, and one big write at the end is much cheaper.
+  f = cStringIO.StringIO()
 
   n = ninja_syntax.Writer(f)
   ru = ninja_lib.Rules(n)
@@ -338,6 +341,8 @@ def main(argv):
 
 
   if action == 'ninja':
+    with open(BUILD_NINJA, 'w') as build_file:
+      build_file.write(f.getvalue())
     log('  (%s) -> %s (%d targets)', argv[0], BUILD_NINJA,
         n.num_build_targets())
 
@@ -3,6 +3,7 @@
 process_test.py: Tests for process.py
 """
 
+import errno
 import os
 import unittest
 
@@ -98,6 +99,84 @@ class ProcessTest(unittest.TestCase):
     self.assertEqual('one', line1)
     self.assertEqual('one', line2)
 
+  def testReadUntilDelim(self):
+    PATH = '_tmp/read-until-delim.txt'
+    with open(PATH, 'w') as f:
+      # Delimiter first, one short line, then bytes with no trailing delimiter
+      f.write('\nab\ncd')
+
+    fd = os.open(PATH, os.O_RDONLY)
+
+    # Delimiter as the very first byte: nothing is accumulated
+    chunks = []
+    ch, err_num = pyos.ReadUntilDelim(fd, pyos.NEWLINE_CH, chunks)
+    self.assertEqual(pyos.NEWLINE_CH, ch)
+    self.assertEqual(0, err_num)
+    self.assertEqual([], chunks)
+
+    ch, err_num = pyos.ReadUntilDelim(fd, pyos.NEWLINE_CH, chunks)
+    self.assertEqual(pyos.NEWLINE_CH, ch)
+    self.assertEqual('ab', ''.join(chunks))
+
+    # EOF without a delimiter: the bytes read so far are still in chunks, so
+    # the caller can retry (e.g. after EINTR) without losing data
+    del chunks[:]
+    ch, err_num = pyos.ReadUntilDelim(fd, pyos.NEWLINE_CH, chunks)
+    self.assertEqual(pyos.EOF_SENTINEL, ch)
+    self.assertEqual('cd', ''.join(chunks))
+
+    # Immediate EOF: nothing appended
+    del chunks[:]
+    ch, err_num = pyos.ReadUntilDelim(fd, pyos.NEWLINE_CH, chunks)
+    self.assertEqual(pyos.EOF_SENTINEL, ch)
+    self.assertEqual([], chunks)
+
+    os.close(fd)
+
+    # Read error: chunks is left alone
+    ch, err_num = pyos.ReadUntilDelim(fd, pyos.NEWLINE_CH, chunks)
+    self.assertEqual(-1, ch)
+    self.assertEqual(errno.EBADF, err_num)
+    self.assertEqual([], chunks)
+
+  def testFileSizeHint(self):
+    PATH = '_tmp/file-size-hint.txt'
+    with open(PATH, 'w') as f:
+      f.write('SH')
+
+    fd = os.open(PATH, os.O_RDONLY)
+    self.assertEqual(2, pyos.FileSizeHint(fd))
+
+    os.lseek(fd, 1, 0)  # SEEK_SET
+    self.assertEqual(1, pyos.FileSizeHint(fd))
+
+    # Seeked past the end: 0, not negative
+    os.lseek(fd, 10, 0)
+    self.assertEqual(0, pyos.FileSizeHint(fd))
+    os.close(fd)
+
+    # Empty file
+    with open(PATH, 'w'):
+      pass
+    fd = os.open(PATH, os.O_RDWR)
+    self.assertEqual(0, pyos.FileSizeHint(fd))
+
+    # The hint is capped at 16 MiB (sparse file; nothing is written)
+    os.ftruncate(fd, (1 << 24) + 100)
+    self.assertEqual(1 << 24, pyos.FileSizeHint(fd))
+    os.lseek(fd, 200, 0)
+    self.assertEqual((1 << 24) - 100, pyos.FileSizeHint(fd))
+    os.close(fd)
+
+    # Pipes aren't regular files
+    r, w = os.pipe()
+    self.assertEqual(-1, pyos.FileSizeHint(r))
+    os.close(r)
+    os.close(w)
+
+    # Bad file descriptor
+    self.assertEqual(-1, pyos.FileSizeHint(fd))
+
   def testProcess(self):
 
     # 3 fds.  Does Python open it?  Shell seems to have it too.  Maybe it
@@ -10,11 +10,11 @@ import pwd
 import resource
 import signal
 import select
+import stat
 import sys
 import termios  # for read -n
 import time
 
-from core import pyutil
 from core.pyerror import log
 
 import posix_ as posix
@@ -84,6 +84,31 @@ def Read(fd, n, chunks):
     return length, 0
 
 
+def FileSizeHint(fd):
+  # type: (int) -> int
+  """Number of bytes left to read if fd is a regular file, or -1.
+
+  Used by 'read --all' to size its reads: for a regular file, one read() of
+  the remaining size drains it.  Pipes, ttys, etc. return -1.
+  """
+  try:
+    st = posix.fstat(fd)
+    if not stat.S_ISREG(st.st_mode):
+      return -1
+    pos = posix.lseek(fd, 0, 1)  # SEEK_CUR
+  except OSError:
+    return -1
+
+  remaining = st.st_size - pos
+  if remaining < 0:  # seeked past the end
+    return 0
+  # Cap the hint at 16 MiB: it sizes a single read() and its buffer, and the
+  # caller's chunked loop handles anything bigger.
+  if remaining > (1 << 24):
+    return 1 << 24
+  return remaining
+
+
 def ReadByte(fd):
   # type: (int) -> Tuple[int, int]
   """
@@ -105,6 +130,35 @@ def ReadByte(fd):
       return EOF_SENTINEL, 0
 
 
+def ReadUntilDelim(fd, delim_byte, chunks):
+  # type: (int, int, List[str]) -> Tuple[int, int]
+  """Read from fd until the delimiter, EOF, or an error.
+
+  Used by _ReadUntilDelim() in the 'read' builtin.  Note that we issue
+  read(fd, 1) calls just like ReadByte(): reading a bigger buffer would steal
+  input past the delimiter from the next reader of the fd.  But the
+  accumulation loop runs down here rather than byte-by-byte in the builtin.
+
+  Bytes before the stopping point are appended to chunks, so the caller can
+  retry after EINTR without losing data.
+
+  Returns:
+    failure: (-1, errno)
+    success: (delim_byte, 0) if the delimiter was found, or (EOF_SENTINEL, 0)
+  """
+  delim_ch = chr(delim_byte)
+  while True:
+    try:
+      b = posix.read(fd, 1)
+    except OSError as e:
+      return -1, e.errno
+    if len(b) == 0:
+      return EOF_SENTINEL, 0
+    if b == delim_ch:
+      return delim_byte, 0
+    chunks.append(b)
+
+
 def ReadLine():
   # type: () -> str
   """Read a line from stdin.
@@ -121,7 +175,9 @@ def ReadLine():
 
   TODO: Add keep_newline arg
   """
-  ch_array = []  # type: List[int]
+  # This file isn't translated, so we can accumulate into a bytearray: one
+  # unboxed byte per append, instead of a PyInt per byte in a List[int].
+  ch_array = bytearray()
   while True:
     ch, err_num = ReadByte(0)
 
@@ -144,7 +200,7 @@ def ReadLine():
     if ch == NEWLINE_CH:
       break
 
-  return pyutil.ChArrayToString(ch_array)
+  return str(ch_array)
 
 
 def Environ():
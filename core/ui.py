@@ -18,13 +18,12 @@ from _devbuild.gen.syntax_asdl import (
 )
 from _devbuild.gen.runtime_asdl import value_str, value_t
 from asdl import runtime
-from asdl import format as fmt
 from frontend import location
 from mycpp import mylib
 from mycpp.mylib import print_stderr, tagswitch, StrFromC
 from qsn_ import qsn
 
-from typing import List, Optional, Any, cast, TYPE_CHECKING
+from typing import Dict, List, Optional, Any, cast, TYPE_CHECKING
 if TYPE_CHECKING:
   from _devbuild.gen import arg_types
   from core.alloc import Arena
@@ -77,12 +76,25 @@ def PrettyDir(dir_name, home_dir):
   Used by the 'dirs' builtin and the prompt evaluator.
   """
   if home_dir is not None:
-    if dir_name == home_dir or dir_name.startswith(home_dir + '/'):
-      return '~' + dir_name[len(home_dir):]
+    if dir_name == home_dir:
+      return '~'
+    # Check the prefix and the separator separately, rather than allocating
+    # home_dir + '/' on every prompt render.
+    n = len(home_dir)
+    if (dir_name.startswith(home_dir) and len(dir_name) > n and
+        dir_name[n] == '/'):
+      return '~' + dir_name[n:]
 
   return dir_name
 
 
+# Reused by _PrintCodeExcerpt() so the common case doesn't allocate a new
+# string of '~' for every error shown.  A literal (80 chars), not '~' * 80:
+# mycpp would turn the latter into a global with a dynamic initializer that
+# allocates before the GC heap exists.
+_TILDES = '~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~'
+
+
 def _PrintCodeExcerpt(line, col, length, f):
   # type: (str, int, int, Writer) -> None
 
@@ -90,11 +102,21 @@ def _PrintCodeExcerpt(line, col, length, f):
 
   buf.write('  '); buf.write(line.rstrip())
   buf.write('\n  ')
-  # preserve tabs
-  for c in line[:col]:
-    buf.write('\t' if c == '\t' else ' ')
+  prefix = line[:col]
+  if '\t' in prefix:
+    # preserve tabs
+    for c in prefix:
+      buf.write('\t' if c == '\t' else ' ')
+  else:
+    # common case: one write, not one per character
+    buf.write(' ' * col)
   buf.write('^')
-  buf.write('~' * (length-1))
+  n = length - 1
+  if n > 0:  # zero-length spans exist, e.g. Eof tokens
+    if n <= 80:
+      buf.write(_TILDES[:n])
+    else:
+      buf.write('~' * n)
   buf.write('\n')
 
   # Do this all in a single write() call so it's less likely to be
@@ -102,6 +124,39 @@ def _PrintCodeExcerpt(line, col, length, f):
   f.write(buf.getvalue())
 
 
+if mylib.PYTHON:
+  # Dispatch table for GetLineSourceString().  These sources have constant
+  # descriptions, so under CPython they skip the tagswitch below.  mycpp
+  # doesn't translate global dicts, so the C++ build uses the tagswitch arms.
+  _CONST_SOURCE_STR = {
+      source_e.Interactive: '[ interactive ]',
+      source_e.Headless: '[ headless ]',
+      source_e.CFlag: '[ -c flag ]',
+  }  # type: Dict[int, str]
+
+if mylib.PYTHON:
+  # path -> qsn.maybe_encode(path).  An INTERN table: the same script and
+  # sourced files are named in every error message, and maybe_encode() is
+  # pure, so quote each path once.  CPython only -- mutating a module-level
+  # dict isn't translation-safe (the C++ global would be constructed before
+  # the GC heap); interned tables in translated code are instance members,
+  # like Arena.line_num_strs.
+  _QUOTED_PATH_CACHE = {}  # type: Dict[str, str]
+
+
+def _QuotedPath(path):
+  # type: (str) -> str
+  if mylib.PYTHON:
+    cached = _QUOTED_PATH_CACHE.get(path)
+    if cached is not None:
+      return cached
+    quoted = qsn.maybe_encode(path)
+    _QUOTED_PATH_CACHE[path] = quoted
+    return quoted
+
+  return qsn.maybe_encode(path)
+
+
 def GetLineSourceString(arena, line_id, quote_filename=False):
   # type: (Arena, int, bool) -> str
   """Returns a human-readable string for dev tools.
@@ -109,6 +164,11 @@ def GetLineSourceString(arena, line_id, quote_filename=False):
   This function is RECURSIVE because there may be dynamic parsing.
   """
   src = arena.GetLineSource(line_id)
+  if mylib.PYTHON:
+    tag = src.tag_()
+    if tag in _CONST_SOURCE_STR:
+      return _CONST_SOURCE_STR[tag]
+
   UP_src = src
 
   with tagswitch(src) as case:
@@ -128,13 +188,13 @@ def GetLineSourceString(arena, line_id, quote_filename=False):
       # also handles characters that are unprintable in a terminal.
       s = src.path
       if quote_filename:
-        s = qsn.maybe_encode(s)
+        s = _QuotedPath(s)
     elif case(source_e.SourcedFile):
       src = cast(source__SourcedFile, UP_src)
       # ditto
       s = src.path
       if quote_filename:
-        s = qsn.maybe_encode(s)
+        s = _QuotedPath(s)
 
     elif case(source_e.ArgvWord):
       src = cast(source__ArgvWord, UP_src)
@@ -204,11 +264,11 @@ def _PrintWithSpanId(prefix, msg, span_id, arena, show_code):
   orig_col = line_span.col
   line_id = line_span.line_id
 
-  src = arena.GetLineSource(line_id)
-  line = arena.GetLine(line_id)
   line_num = arena.GetLineNumber(line_id)  # overwritten by source__LValue case
 
   if show_code:
+    # Only look up the source and line text when we're going to quote code.
+    src = arena.GetLineSource(line_id)
     UP_src = src
     # LValue/backticks is the only case where we don't print this
     if src.tag_() == source_e.Reparsed:
@@ -229,6 +289,7 @@ def _PrintWithSpanId(prefix, msg, span_id, arena, show_code):
       _PrintCodeExcerpt(line2, orig_col + lbracket_col, 1, f)
 
     else:
+      line = arena.GetLine(line_id)
       _PrintCodeExcerpt(line, line_span.col, line_span.length, f)
 
   source_str = GetLineSourceString(arena, line_id, quote_filename=True)
@@ -358,6 +419,8 @@ class ErrorFormatter(object):
 def PrintAst(node, flag):
   # type: (command_t, arg_types.main) -> None
 
+  from asdl import format as fmt  # lazy: only --ast-format pays for it
+
   if flag.ast_format == 'none':
     print_stderr('AST not printed.')
     if 0:
@@ -373,6 +436,8 @@ def PrintAst(node, flag):
     f = mylib.Stdout()
 
     afmt = flag.ast_format  # note: mycpp rewrite to avoid 'in'
+    abbrev = afmt.startswith('abbrev-')  # computed once, tested twice
+
     if afmt in ('text', 'abbrev-text'):
       ast_f = fmt.DetectConsoleOutput(f)
     elif afmt in ('html', 'abbrev-html'):
@@ -380,7 +445,7 @@ def PrintAst(node, flag):
     else:
       raise AssertionError()
 
-    if 'abbrev-' in afmt:
+    if abbrev:
       # ASDL "abbreviations" are only supported by asdl/gen_python.py
       if mylib.PYTHON:
         tree = node.AbbreviatedTree()
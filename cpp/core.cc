@@ -46,6 +46,31 @@ Tuple2<int, int> Read(int fd, int n, List<Str*>* chunks) {
   return Tuple2<int, int>(length, 0);
 }
 
+int FileSizeHint(int fd) {
+  struct stat st;
+  if (fstat(fd, &st) < 0) {
+    return -1;
+  }
+  if (!S_ISREG(st.st_mode)) {
+    return -1;
+  }
+  off_t pos = lseek(fd, 0, SEEK_CUR);
+  if (pos < 0) {
+    return -1;
+  }
+  if (st.st_size < pos) {  // seeked past the end
+    return 0;
+  }
+  off_t remaining = st.st_size - pos;
+  // Cap the hint at 16 MiB: it sizes a single read() and its buffer, the
+  // caller's chunked loop handles anything bigger, and the cap keeps the
+  // off_t difference in int range.
+  if (remaining > (1 << 24)) {
+    return 1 << 24;
+  }
+  return remaining;
+}
+
 Tuple2<int, int> ReadByte(int fd) {
   unsigned char buf[1];
   ssize_t n = read(fd, &buf, 1);
@@ -58,6 +83,47 @@ Tuple2<int, int> ReadByte(int fd) {
   }
 }
 
+// Like ReadByte(), the input is UNBUFFERED: reading a bigger buffer would
+// steal input past the delimiter from the next reader of the fd.  dash, mksh,
+// and zsh read a byte at a time too.  But the loop runs here in C, and we
+// append whole strings to chunks, not one Str per byte.
+//
+// Note: that also means there's no delimiter *scan* to vectorize.  Each
+// read() yields at most one byte, so the comparison below IS the whole
+// search; the cost lives in the syscalls, not the scanning.
+Tuple2<int, int> ReadUntilDelim(int fd, int delim_byte, List<Str*>* chunks) {
+  unsigned char buf[4096];
+  int len = 0;
+  int result;
+  int err_num = 0;
+  while (true) {
+    unsigned char ch;
+    ssize_t n = read(fd, &ch, 1);
+    if (n < 0) {
+      result = -1;
+      err_num = errno;
+      break;
+    }
+    if (n == 0) {
+      result = EOF_SENTINEL;
+      break;
+    }
+    if (ch == delim_byte) {
+      result = delim_byte;
+      break;
+    }
+    buf[len++] = ch;
+    if (len == static_cast<int>(sizeof(buf))) {
+      chunks->append(StrFromC(reinterpret_cast<char*>(buf), len));
+      len = 0;
+    }
+  }
+  if (len) {
+    chunks->append(StrFromC(reinterpret_cast<char*>(buf), len));
+  }
+  return Tuple2<int, int>(result, err_num);
+}
+
 // for read --line
 Str* ReadLine() {
   assert(0);  // Does this get called?
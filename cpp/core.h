@@ -27,7 +27,9 @@ const int kMaxSignalsInFlight = 1024;
 
 Tuple2<int, int> WaitPid();
 Tuple2<int, int> Read(int fd, int n, List<Str*>* chunks);
+int FileSizeHint(int fd);
 Tuple2<int, int> ReadByte(int fd);
+Tuple2<int, int> ReadUntilDelim(int fd, int delim_byte, List<Str*>* chunks);
 Str* ReadLine();
 Dict<Str*, Str*>* Environ();
 int Chdir(Str* dest_dir);
@@ -102,6 +102,72 @@ TEST pyos_readbyte_test() {
   PASS();
 }
 
+TEST pyos_read_until_delim_test() {
+  const char* tmp_name = "pyos_ReadUntilDelim";
+  int fd = ::open(tmp_name, O_CREAT | O_RDWR | O_TRUNC, 0644);
+  ASSERT(fd > 0);
+  // Delimiter first, one short line, then bytes with no trailing delimiter
+  write(fd, "\nab\ncd", 6);
+  close(fd);
+
+  fd = ::open(tmp_name, O_RDWR, 0644);
+  ASSERT(fd > 0);
+
+  List<Str*>* chunks = NewList<Str*>();
+
+  // Delimiter as the very first byte: nothing is accumulated
+  Tuple2<int, int> tup = pyos::ReadUntilDelim(fd, '\n', chunks);
+  ASSERT_EQ_FMT('\n', tup.at0(), "%d");
+  ASSERT_EQ_FMT(0, tup.at1(), "%d");  // error code
+  ASSERT_EQ_FMT(0, len(chunks), "%d");
+
+  tup = pyos::ReadUntilDelim(fd, '\n', chunks);
+  ASSERT_EQ_FMT('\n', tup.at0(), "%d");
+  ASSERT_EQ_FMT(1, len(chunks), "%d");
+  ASSERT(str_equals(StrFromC("ab"), chunks->index_(0)));
+
+  // EOF without a delimiter: the bytes read so far are still appended, so
+  // the caller can retry (e.g. after EINTR) without losing data
+  tup = pyos::ReadUntilDelim(fd, '\n', chunks);
+  ASSERT_EQ_FMT(pyos::EOF_SENTINEL, tup.at0(), "%d");
+  ASSERT_EQ_FMT(2, len(chunks), "%d");
+  ASSERT(str_equals(StrFromC("cd"), chunks->index_(1)));
+
+  // Immediate EOF: nothing appended
+  tup = pyos::ReadUntilDelim(fd, '\n', chunks);
+  ASSERT_EQ_FMT(pyos::EOF_SENTINEL, tup.at0(), "%d");
+  ASSERT_EQ_FMT(2, len(chunks), "%d");
+  close(fd);
+
+  // Read error: chunks is left alone
+  tup = pyos::ReadUntilDelim(fd, '\n', chunks);  // fd is closed now
+  ASSERT_EQ_FMT(-1, tup.at0(), "%d");
+  ASSERT_EQ_FMT(EBADF, tup.at1(), "%d");
+  ASSERT_EQ_FMT(2, len(chunks), "%d");
+
+  // Internal buffer boundary: the first 4096 bytes are flushed as one chunk
+  // when the buffer fills, and the bytes after the boundary as another
+  fd = ::open(tmp_name, O_CREAT | O_RDWR | O_TRUNC, 0644);
+  ASSERT(fd > 0);
+  char big[4096];
+  memset(big, 'x', sizeof(big));
+  write(fd, big, sizeof(big));
+  write(fd, "yz\n", 3);
+  close(fd);
+
+  fd = ::open(tmp_name, O_RDWR, 0644);
+  ASSERT(fd > 0);
+  chunks = NewList<Str*>();
+  tup = pyos::ReadUntilDelim(fd, '\n', chunks);
+  ASSERT_EQ_FMT('\n', tup.at0(), "%d");
+  ASSERT_EQ_FMT(2, len(chunks), "%d");
+  ASSERT_EQ_FMT(4096, len(chunks->index_(0)), "%d");
+  ASSERT(str_equals(StrFromC("yz"), chunks->index_(1)));
+  close(fd);
+
+  PASS();
+}
+
 TEST pyos_read_test() {
   const char* tmp_name = "pyos_Read";
   int fd = ::open(tmp_name, O_CREAT | O_RDWR, 0644);
@@ -134,6 +200,47 @@ TEST pyos_read_test() {
   PASS();
 }
 
+TEST pyos_file_size_hint_test() {
+  const char* tmp_name = "pyos_FileSizeHint";
+  int fd = ::open(tmp_name, O_CREAT | O_RDWR | O_TRUNC, 0644);
+  ASSERT(fd > 0);
+
+  // Empty file
+  ASSERT_EQ_FMT(0, pyos::FileSizeHint(fd), "%d");
+
+  write(fd, "SH", 2);
+  ASSERT_EQ_FMT(0, pyos::FileSizeHint(fd), "%d");  // already at the end
+
+  lseek(fd, 0, SEEK_SET);
+  ASSERT_EQ_FMT(2, pyos::FileSizeHint(fd), "%d");
+  lseek(fd, 1, SEEK_SET);
+  ASSERT_EQ_FMT(1, pyos::FileSizeHint(fd), "%d");
+
+  // Seeked past the end: 0, not negative
+  lseek(fd, 10, SEEK_SET);
+  ASSERT_EQ_FMT(0, pyos::FileSizeHint(fd), "%d");
+
+  // The hint is capped at 16 MiB (sparse file; nothing is written)
+  ASSERT_EQ(0, ftruncate(fd, (1 << 24) + 100));
+  lseek(fd, 0, SEEK_SET);
+  ASSERT_EQ_FMT(1 << 24, pyos::FileSizeHint(fd), "%d");
+  lseek(fd, 200, SEEK_SET);
+  ASSERT_EQ_FMT((1 << 24) - 100, pyos::FileSizeHint(fd), "%d");
+  close(fd);
+
+  // Pipes aren't regular files
+  int fds[2];
+  ASSERT_EQ(0, pipe(fds));
+  ASSERT_EQ_FMT(-1, pyos::FileSizeHint(fds[0]), "%d");
+  close(fds[0]);
+  close(fds[1]);
+
+  // Bad file descriptor
+  ASSERT_EQ_FMT(-1, pyos::FileSizeHint(-1), "%d");
+
+  PASS();
+}
+
 TEST pyos_test() {
   Tuple3<double, double, double> t = pyos::Time();
   ASSERT(t.at0() > 0.0);
@@ -310,7 +417,9 @@ int main(int argc, char** argv) {
   RUN_TEST(user_home_dir_test);
   RUN_TEST(uname_test);
   RUN_TEST(pyos_readbyte_test);
+  RUN_TEST(pyos_read_until_delim_test);
   RUN_TEST(pyos_read_test);
+  RUN_TEST(pyos_file_size_hint_test);
   RUN_TEST(pyos_test);  // non-hermetic
   RUN_TEST(pyutil_test);
   RUN_TEST(strerror_test);
@@ -4,10 +4,15 @@ mycpp_main.py - Translate a subset of Python to C++, using MyPy's typed AST.
 """
 from __future__ import print_function
 
+import hashlib
+import io
 import optparse
 import os
+import shutil
 import sys
 
+from glob import glob
+
 from typing import List, Optional, Tuple
 
 from mypy import build
@@ -15,14 +20,19 @@ from mypy.build import build as mypy_build
 from mypy.build import BuildSource
 from mypy.main import process_options
 from mypy.options import Options
+from mypy.version import __version__ as mypy_version
 
 from mycpp import const_pass
 from mycpp import cppgen_pass
-from mycpp import debug_pass
 from mycpp import pass_state
 from mycpp.util import log
 
 
+# Environment is read once at module load, not per get_mypy_config() call.
+MYCPP_INCREMENTAL = bool(os.getenv('MYCPP_INCREMENTAL'))
+MYCPP_CACHE_DIR = os.getenv('MYCPP_CACHE_DIR', '_build/mycpp/mypy-cache')
+
+
 def Options():
   """Returns an option parser instance."""
 
@@ -57,21 +67,24 @@ def get_mypy_config(paths: List[str],
 
     sources, options = process_options(mypy_options)
 
-    # OSH PATCH
-    #if options.python_version[0] == 2:
-    if 0:
-        fail('Python 2 not supported')
-
-    # OSH Patch!
-    #if not options.strict_optional:
-    if 0:
-        fail('Disabling strict optional checking not supported')
+    # OSH PATCH: the mypyc guards against --py2 and --no-strict-optional
+    # were deleted here; mycpp requires both.
 
     options.show_traceback = True
     # Needed to get types for all AST nodes
     options.export_types = True
-    # TODO: Support incremental checking
-    options.incremental = False
+    # Incremental type checking reuses mypy's serialized cache across runs.
+    # The cache stores module interfaces WITHOUT function bodies, so on a
+    # warm run, cache-hit modules come back without the ASTs the codegen
+    # passes need -- a warm incremental run is NOT sound for translation.
+    # The knob exists for type-checking experiments only; main() refuses to
+    # generate code from a body-less module rather than silently emitting
+    # broken C++.
+    if MYCPP_INCREMENTAL:
+        options.incremental = True
+        options.cache_dir = MYCPP_CACHE_DIR
+    else:
+        options.incremental = False
     # 10/2019: FIX for MyPy 0.730.  Not sure why I need this but I do.
     options.preserve_asts = True
 
@@ -79,43 +92,93 @@ def get_mypy_config(paths: List[str],
     # Same as devtools/types.sh
     options.warn_unused_ignores = False
 
-    for source in sources:
-        options.per_module_options.setdefault(source.module, {})['mypyc'] = True
+    # One setdefault() call per module added up; build the fresh entries with
+    # a single comprehension, then patch the (rare) modules that already had
+    # per-module options.
+    per_module = options.per_module_options
+    for mod in [s.module for s in sources if s.module in per_module]:
+        per_module[mod]['mypyc'] = True
+    per_module.update(
+        {s.module: {'mypyc': True}
+         for s in sources if s.module not in per_module})
 
     return sources, options
 
 
+def InputsDigest(paths: List[str], opts) -> str:
+  """SHA256 over everything that determines the translator output.
+
+  mycpp is invoked with the COMPLETE list of sources (from translate.txt), so
+  hashing their contents is a sound cache key.  The translator's own sources
+  are included too, since editing mycpp must invalidate old output.
+
+  (Pickling mypy's BuildResult was considered, but its AST nodes aren't
+  picklable.)
+  """
+  h = hashlib.sha256()
+  h.update(mypy_version.encode('utf-8'))  # a mypy upgrade changes the ASTs
+  h.update(repr(sorted(opts.to_header)).encode('utf-8'))
+
+  this_dir = os.path.dirname(os.path.abspath(__file__))
+  tool_paths = [
+      os.path.join(this_dir, name) for name in sorted(os.listdir(this_dir))
+      if name.endswith('.py')
+  ]
+
+  # Inputs that --follow-imports pulls in beyond argv: the generated
+  # _devbuild/gen modules, and the .pyi stubs for C extensions on MYPYPATH.
+  extra_paths = sorted(glob('_devbuild/gen/*.py'))
+  for stub_dir in os.environ.get('MYPYPATH', '').split(':'):
+    if len(stub_dir):
+      extra_paths.extend(sorted(glob(os.path.join(stub_dir, '*.pyi'))))
+
+  for path in tool_paths + extra_paths + paths:
+    h.update(path.encode('utf-8'))
+    with open(path, 'rb') as f:
+      h.update(f.read())
+  return h.hexdigest()
+
+
+def _FileDigest(path: str) -> str:
+  """SHA256 of a file's contents, for validating cached output."""
+  h = hashlib.sha256()
+  with open(path, 'rb') as f:
+    h.update(f.read())
+  return h.hexdigest()
+
+
 def ModulesToCompile(result, mod_names):
   # HACK TO PUT asdl/runtime FIRST.  It has runtime::SPID.
   #
   # Another fix is to hoist those to the declaration phase?  Not sure if that
   # makes sense.
 
-  # FIRST files.  Somehow the MyPy builder reorders the modules.
-  for name, module in result.files.items():
-    if name in ('asdl.runtime', 'core.vm'):
-      yield name, module
+  # The last dotted component must be a command-line module.  Match with one
+  # endswith() against a tuple of '.foo' suffixes instead of splitting every
+  # name; top-level modules have no dot and match by equality.
+  mod_name_set = set(mod_names)
+  suffixes = tuple('.' + name for name in mod_names)
 
+  # Single pass over result.files, bucketing each module.
+  first = []  # Somehow the MyPy builder reorders the modules.
+  middle = []
+  last = []  # they use base classes
   for name, module in result.files.items():
-    # Only translate files that were mentioned on the command line
-    suffix = name.split('.')[-1]
-    if suffix not in mod_names:
-      continue
-
-    # FIRST files.  Don't do it a second time!
     if name in ('asdl.runtime', 'core.vm'):
-      continue
-
-    # should be LAST they use base classes
-    if name in ('osh.builtin_bracket', 'core.shell'):
-      continue
-
-    yield name, module
+      first.append((name, module))
+    elif name in ('osh.builtin_bracket', 'core.shell'):
+      last.append((name, module))
+    else:
+      # Only translate files that were mentioned on the command line
+      if name in mod_name_set or name.endswith(suffixes):
+        middle.append((name, module))
 
-  # LAST files
-  for name, module in result.files.items():
-    if name in ('osh.builtin_bracket', 'core.shell'):
-      yield name, module
+  for pair in first:
+    yield pair
+  for pair in middle:
+    yield pair
+  for pair in last:
+    yield pair
 
 
 def main(argv):
@@ -134,35 +197,56 @@ def main(argv):
 
   log('\tmycpp: LOADING %s', ' '.join(paths))
 
-  if 0:
-    print(opts)
-    print(paths)
-    return
-
   # e.g. asdl/typed_arith_parse.py -> 'typed_arith_parse'
-  mod_names = [os.path.basename(p) for p in paths]
-  mod_names = [os.path.splitext(name)[0] for name in mod_names]
+  mod_names = [os.path.splitext(os.path.basename(p))[0] for p in paths]
 
-  # Ditto
   to_header = opts.to_header
-  #if to_header:
-  if 0:
-    to_header = [os.path.basename(p) for p in to_header]
-    to_header = [os.path.splitext(name)[0] for name in to_header]
-
   #log('to_header %s', to_header)
 
+  # Persistent cache: if nothing that determines the output changed since the
+  # last successful run, skip type checking and codegen entirely.  This also
+  # covers the warm-run cost of mypy deserializing its graph: a hit returns
+  # before mypy_build(), so neither the graph nor its serialized cache is
+  # touched at all.  Serializing result.graph ourselves would only help the
+  # miss path, where we need full ASTs that the serialized form doesn't keep.
+  # The shwrap-mycpp wrapper in build/ninja-rules-py.sh invokes us with
+  # --cc-out $out.tmp and does 'mv $tmp $out' afterward, so key the digest on
+  # the DURABLE path, and on a hit, restore the .tmp file the wrapper is
+  # about to mv.
+  input_digest = None
+  digest_path = None
+  cc_out_final = opts.cc_out
+  if cc_out_final:
+    if cc_out_final.endswith('.tmp'):  # the shwrap-mycpp convention
+      cc_out_final = cc_out_final[:-len('.tmp')]
+    digest_path = cc_out_final + '.sha256'
+    input_digest = InputsDigest(paths, opts)
+    outputs = [cc_out_final]
+    if opts.header_out:
+      outputs.append(opts.header_out)
+    if all(os.path.exists(out) for out in outputs) and os.path.exists(digest_path):
+      with open(digest_path) as df:
+        recorded = df.read().split()
+      # Line 1 is the input digest; line 2 is the digest of the .cc we
+      # emitted.  Checking the second against the file on disk makes the hit
+      # self-validating: the digest is written before the wrapper's mv, so if
+      # that build died in between, the durable .cc is still the OLD output
+      # and won't match -- we regenerate instead of serving it.
+      if (len(recorded) == 2 and recorded[0] == input_digest and
+          recorded[1] == _FileDigest(cc_out_final)):
+        log('\tmycpp: %s is up to date', cc_out_final)
+        if cc_out_final != opts.cc_out:
+          shutil.copyfile(cc_out_final, opts.cc_out)
+        return 0
+
   sources, options = get_mypy_config(paths, mypy_options)
-  if 0:
+  if opts.verbose:
     for source in sources:
       log('source %s', source)
   #log('options %s', options)
 
   #result = emitmodule.parse_and_typecheck(sources, options)
-  import time
-  start_time = time.time()
   result = mypy_build(sources=sources, options=options)
-  #log('elapsed 1: %f', time.time() - start_time)
 
   if result.errors:
     log('')
@@ -191,9 +275,15 @@ def main(argv):
   #build.dump_graph(result.graph)
   #return
 
-  # no-op
-  for name in result.graph:
-    state = result.graph[name]
+  # Note on caching granularity: the translation unit is the smallest thing
+  # we can cache (see InputsDigest above).  Per-module output reuse doesn't
+  # work because the passes below share global state across modules: the
+  # str0 ... strN constant numbering, the fmt_ids counter, and the virtual
+  # method calculation.  Changing one module can renumber every other one.
+  #
+  # The same coupling rules out farming modules out to worker processes:
+  # mypy AST nodes aren't picklable, and the passes fill shared tables in a
+  # deterministic order that the generated code depends on.
 
   # GLOBAL Constant pass over all modules.  We want to collect duplicate
   # strings together.  And have globally unique IDs str0, str1, ... strN.
@@ -204,10 +294,9 @@ def main(argv):
   to_compile = list(ModulesToCompile(result, mod_names))
 
   # HACK: Why do I get oil.asdl.tdop in addition to asdl.tdop?
-  names = set(name for name, _ in to_compile)
-
-  filtered = []
-  seen = set()
+  # Strip the redundant package prefixes and build a dict in one pass; the
+  # first occurrence of each stripped name wins, which removes the dupes.
+  unique = {}
   for name, module in to_compile:
     if name.startswith('oil.'):
       name = name[4:]
@@ -216,32 +305,28 @@ def main(argv):
     if name.startswith('mycpp.'):
       name = name[6:]
 
-    if name not in seen:  # remove dupe
-      filtered.append((name, module))
-      seen.add(name)
+    if name not in unique:
+      unique[name] = module
+
+  to_compile = list(unique.items())
 
-  to_compile = filtered
+  # Refuse to translate modules that came back without body ASTs, e.g. when
+  # MYCPP_INCREMENTAL served them from mypy's serialized cache, which stores
+  # interfaces only.  Codegen from such a tree is silently wrong.
+  bad = [name for name, module in to_compile if len(module.defs) == 0]
+  if bad:
+    log('mycpp: no body ASTs for %s (served from the mypy cache?)',
+        ' '.join(bad))
+    log('mycpp: run without MYCPP_INCREMENTAL, or delete the cache dir')
+    return 1
 
-  import pickle
-  if 0:
+  if opts.verbose:
     for name, module in to_compile:
       log('to_compile %s', name)
 
-      # can't pickle but now I see deserialize() nodes and stuff
-      #s = pickle.dumps(module)
-      #log('%d pickle', len(s))
-
-  # Print the tree for debugging
-  if 0:
-    for name, module in to_compile:
-      builder = debug_pass.Print(result.types)
-      builder.visit_mypy_file(module)
-    return
-
-  if opts.cc_out:
-    f = open(opts.cc_out, 'w')
-  else:
-    f = sys.stdout
+  # Buffer the whole .cc output in memory; the passes make a huge number of
+  # small write() calls, and the destination is written once at the end.
+  f = io.StringIO()
 
   f.write("""\
 // BEGIN mycpp output
@@ -250,43 +335,52 @@ def main(argv):
 
 """)
 
-  # Collect constants and then emit code.
-  log('\tmycpp pass: CONST')
-  for name, module in to_compile:
-    pass1.visit_mypy_file(module)
-
-  # Instead of top-level code, should we generate a function and call it from
-  # main?
-  for line in const_code:
-    f.write('%s\n' % line)
-  f.write('\n')
-
   # Note: doesn't take into account module names!
   virtual = pass_state.Virtual()
 
-  if opts.header_out:
-    header_f = open(opts.header_out, 'w')  # Not closed
+  # Buffered like f; written via a context manager at the end, which also
+  # fixes the file object that was never closed.
+  header_f = io.StringIO()
 
-  log('\tmycpp pass: FORWARD DECL')
+  # Route each module to its output file ONCE; each phase below walks this
+  # same list.  The phases themselves can't be fused into one traversal:
+  # all forward decls must precede all prototypes, which must precede all
+  # implementations, and cppgen_pass expresses the phase with the
+  # forward_decl= and decl= flags.
+  to_header_set = set(to_header)
+  routed = [(name, module, header_f if name in to_header_set else f)
+            for name, module in to_compile]
 
-  # Forward declarations first.
+  log('\tmycpp pass: CONST + FORWARD DECL')
+
+  # One traversal collects constants AND writes forward declarations.
   # class Foo; class Bar;
-  for name, module in to_compile:
+  # Constants belong BEFORE the forward decls in the .cc file, but they're
+  # only complete after the traversal, so buffer the .cc-bound decls.
+  fwd_buf = io.StringIO()
+  for name, module, out_f in routed:
     #log('forward decl name %s', name)
-    if name in to_header:
-      out_f = header_f
-    else:
-      out_f = f
-    p2 = cppgen_pass.Generate(result.types, const_lookup, out_f,
+    pass1.visit_mypy_file(module)
+
+    p2 = cppgen_pass.Generate(result.types, const_lookup,
+                              fwd_buf if out_f is f else out_f,
                               virtual=virtual, forward_decl=True)
 
     p2.visit_mypy_file(module)
     MaybeExitWithErrors(p2)
 
+  # Instead of top-level code, should we generate a function and call it from
+  # main?
+  for line in const_code:
+    f.write('%s\n' % line)
+  f.write('\n')
+
+  f.write(fwd_buf.getvalue())
+
   # After seeing class and method names in the first pass, figure out which
   # ones are virtual.  We use this info in the second pass.
   virtual.Calculate()
-  if 0:
+  if opts.verbose:
     log('virtuals %s', virtual.virtuals)
     log('has_vtable %s', virtual.has_vtable)
 
@@ -301,12 +395,8 @@ def main(argv):
 
   # First generate ALL C++ declarations / "headers".
   # class Foo { void method(); }; class Bar { void method(); };
-  for name, module in to_compile:
+  for name, module, out_f in routed:
     #log('decl name %s', name)
-    if name in to_header:
-      out_f = header_f
-    else:
-      out_f = f
     p3 = cppgen_pass.Generate(result.types, const_lookup, out_f,
                               local_vars=local_vars, fmt_ids=fmt_ids,
                               field_gc=field_gc,
@@ -320,13 +410,33 @@ def main(argv):
   # Now the definitions / implementations.
   # void Foo:method() { ... }
   # void Bar:method() { ... }
-  for name, module in to_compile:
+  for name, module, _ in routed:  # impl always goes in the .cc file
     p4 = cppgen_pass.Generate(result.types, const_lookup, f,
                               local_vars=local_vars, fmt_ids=fmt_ids,
                               field_gc=field_gc)
     p4.visit_mypy_file(module)
     MaybeExitWithErrors(p4)
 
+  # Flush the buffered output with a single write.
+  if opts.header_out:
+    with open(opts.header_out, 'w') as out:
+      out.write(header_f.getvalue())
+
+  cc_text = f.getvalue()
+  if opts.cc_out:
+    with open(opts.cc_out, 'w') as cc_f:
+      cc_f.write(cc_text)
+  else:
+    sys.stdout.write(cc_text)
+
+  # Record what this output was built from, AND what it is: the second line
+  # lets the up-to-date check above verify that the .cc on disk really is the
+  # output this digest describes.
+  if digest_path:
+    cc_digest = hashlib.sha256(cc_text.encode('utf-8')).hexdigest()
+    with open(digest_path, 'w') as df:
+      df.write('%s\n%s\n' % (input_digest, cc_digest))
+
   return 0  # success
 
 
@@ -63,15 +63,27 @@ class Virtual(object):
 
     TODO: Are there bugs based on conflicting class names?
     """
+    # A class can appear as a base and as a subclass (or under several
+    # bases), so memoize each class's method set instead of rebuilding it
+    # for every edge.
+    method_sets: dict[str, set[str]] = {}
+
+    def MethodSet(class_name: str) -> set[str]:
+      s = method_sets.get(class_name)
+      if s is None:
+        s = set(self.methods[class_name])
+        method_sets[class_name] = s
+      return s
+
     for base_class, subclasses in self.subclasses.items():
       self.can_reorder_fields[base_class] = False
 
+      b_methods = MethodSet(base_class)
+
       for subclass in subclasses:
         self.can_reorder_fields[subclass] = False
 
-        b_methods = self.methods[base_class]
-        s_methods = self.methods[subclass]
-        overlapping = set(b_methods) & set(s_methods)
+        overlapping = b_methods & MethodSet(subclass)
         for method in overlapping:
           self.virtuals.append((base_class, method))
           self.virtuals.append((subclass, method))
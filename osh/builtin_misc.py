@@ -30,6 +30,7 @@ from frontend import reader
 from frontend import typed_args
 from mycpp import mylib
 from mycpp.mylib import STDIN_FILENO
+from osh import split
 from osh import word_compile
 from pylib import os_path
 from qsn_ import qsn_native
@@ -37,7 +38,7 @@ from qsn_ import qsn_native
 import libc
 import posix_ as posix
 
-from typing import Tuple, List, Optional, Any, TYPE_CHECKING
+from typing import Tuple, List, Dict, Optional, Any, TYPE_CHECKING
 if TYPE_CHECKING:
   from _devbuild.gen.runtime_asdl import span_t
   from core.pyutil import _ResourceLoader
@@ -84,6 +85,14 @@ class Times(vm._Builtin):
 # - The backslash character '\' may be used to remove any special meaning for
 #   the next character read and for line continuation.
 
+def _VarName(name):
+  # type: (str) -> str
+  """Strip the optional : sigil from a variable name, e.g. 'read :x'."""
+  if name.startswith(':'):
+    return name[1:]
+  return name
+
+
 def _AppendParts(s, spans, max_results, join_next, parts):
   # type: (str, List[Tuple[span_t, int]], int, bool, List[mylib.BufWriter]) -> Tuple[bool, bool]
   """ Append to 'parts', for the 'read' builtin.
@@ -104,29 +113,44 @@ def _AppendParts(s, spans, max_results, join_next, parts):
   # two black spans.
   last_span_was_black = False
 
+  # The List[Tuple[span_t, int]] representation is the splitter's interface,
+  # shared with _SpansToParts for word evaluation; see the TODO on
+  # IfsSplitter.Split about changing it for everyone.
+  #
+  # Hoisted out of the loop, which runs once per span of the input line:
+  # attribute lookups on span_e, and len(parts) for the max_results check.
+  span_black = span_e.Black
+  span_delim = span_e.Delim
+  span_backslash = span_e.Backslash
+  num_parts = len(parts)
+
   for span_type, end_index in spans:
-    if span_type == span_e.Black:
-      if join_next and parts:
+    if span_type == span_black:
+      if join_next and num_parts:
         parts[-1].write(s[start_index:end_index])
         join_next = False
       else:
+        # One BufWriter per field.  (A free list of them across 'read' calls
+        # isn't worth it: in C++ this is a bump allocation in the GC heap,
+        # and the pool would root otherwise-dead buffers.)
         buf = mylib.BufWriter()
         buf.write(s[start_index:end_index])
         parts.append(buf)
+        num_parts += 1
       last_span_was_black = True
 
-    elif span_type == span_e.Delim:
+    elif span_type == span_delim:
       if join_next:
         parts[-1].write(s[start_index:end_index])
         join_next = False
       last_span_was_black = False
 
-    elif span_type == span_e.Backslash:
+    elif span_type == span_backslash:
       if last_span_was_black:
         join_next = True
       last_span_was_black = False
 
-    if max_results and len(parts) >= max_results:
+    if max_results != 0 and num_parts >= max_results:
       join_next = True
 
     start_index = end_index
@@ -149,6 +173,9 @@ def _AppendParts(s, spans, max_results, join_next, parts):
 
 def _ReadN(num_bytes, cmd_ev):
   # type: (int, CommandEvaluator) -> str
+  # Accumulate str chunks and join once at the end.  (Not a bytearray: that
+  # type isn't in the translated subset, and ''.join is already a single
+  # sized allocation plus copy in both runtimes.)
   chunks = []  # type: List[str]
   bytes_left = num_bytes
   while bytes_left > 0:
@@ -177,13 +204,13 @@ def _ReadUntilDelim(delim_byte, cmd_ev):
   Read until that delimiter, but don't include it.
   """
   eof = False
-  ch_array = []  # type: List[int]
+  chunks = []  # type: List[str]
   while True:
-    ch, err_num = pyos.ReadByte(0)
+    ch, err_num = pyos.ReadUntilDelim(0, delim_byte, chunks)
     if ch < 0:
       if err_num == EINTR:
         cmd_ev.RunPendingTraps()
-        # retry after running traps
+        # retry after running traps; partial input is already in chunks
       else:
         raise pyos.ReadError(err_num)
 
@@ -191,13 +218,10 @@ def _ReadUntilDelim(delim_byte, cmd_ev):
       eof = True
       break
 
-    elif ch == delim_byte:
+    else:  # delimiter was found
       break
 
-    else:
-      ch_array.append(ch)
-
-  return pyutil.ChArrayToString(ch_array), eof
+  return ''.join(chunks), eof
 
 
 # sys.stdin.readline() in Python has its own buffering which is incompatible
@@ -241,14 +265,25 @@ def _ReadAll():
 
   Similar to command sub in core/executor.py.
   """
+  # When stdin is a regular file, fstat() tells us how much is left, and a
+  # single read() of that size (plus one returning 0 bytes for EOF) replaces
+  # the chunked loop.  The hint is capped at 16 MiB, so huge files still
+  # loop, just in much bigger chunks.  Pipes and ttys get -1 and fall back
+  # to 64 KiB chunks;
+  # unlike the delimited reads, we can't over-read here, since we're consuming
+  # the whole stream anyway.
+  n_to_read = pyos.FileSizeHint(0) + 1
+  if n_to_read < 65536:
+    n_to_read = 65536
+
   chunks = []  # type: List[str]
   while True:
-    n, err_num = pyos.Read(0, 4096, chunks)
+    n, err_num = pyos.Read(0, n_to_read, chunks)
 
     if n < 0:
       if err_num == EINTR:
         # Retry only.  Like read --line (and command sub), read --all doesn't
-        # run traps.  It would be a bit weird to run every 4096 bytes.
+        # run traps.  It would be a bit weird to run every 64 KiB.
         pass
       else:
         raise pyos.ReadError(err_num)
@@ -270,6 +305,12 @@ class Read(vm._Builtin):
     self.errfmt = errfmt
     self.stdin = mylib.Stdin()
 
+    # Parsed arg records for the two most common invocation shapes, 'read var'
+    # and 'read -r var'.  Flag parsing is deterministic, so these can be
+    # reused once the first such call has parsed them.
+    self.arg_cache_default = None  # type: Optional[arg_types.read]
+    self.arg_cache_raw = None  # type: Optional[arg_types.read]
+
   def _Line(self, arg, var_name):
     # type: (arg_types.read, str) -> int
     """For read --line."""
@@ -281,10 +322,13 @@ class Read(vm._Builtin):
       return 1
 
     if not arg.with_eol:
-      if line.endswith('\r\n'):
-        line = line[:-2]
-      elif line.endswith('\n'):
-        line = line[:-1]
+      # Equivalent to endswith('\r\n') / endswith('\n'), but indexing chars
+      # directly is cheaper than two method calls per line.
+      n = len(line)
+      if n >= 2 and line[n - 2] == '\r' and line[n - 1] == '\n':
+        line = line[:n - 2]
+      elif line[n - 1] == '\n':  # n >= 1, since we returned on the empty line
+        line = line[:n - 1]
 
     # Lines that don't start with a single quote aren't QSN.  They may contain
     # a single quote internally, like:
@@ -337,18 +381,36 @@ class Read(vm._Builtin):
 
   def _Run(self, cmd_val):
     # type: (cmd_value__Argv) -> int
+    argv = cmd_val.argv
+    num_args = len(argv)
+
+    # Fast paths that skip flag parsing, for 'while read line' loops.
+    if cmd_val.typed_args is None:
+      if (num_args == 2 and not argv[1].startswith('-') and
+          self.arg_cache_default is not None):
+        return self._Read(self.arg_cache_default, [argv[1]])
+
+      if (num_args == 3 and argv[1] == '-r' and not argv[2].startswith('-') and
+          self.arg_cache_raw is not None):
+        return self._Read(self.arg_cache_raw, [argv[2]])
+
     attrs, arg_r = flag_spec.ParseCmdVal('read', cmd_val)
     arg = arg_types.read(attrs.attrs)
     names = arg_r.Rest()
 
+    if cmd_val.typed_args is None:
+      if num_args == 2 and not argv[1].startswith('-'):
+        self.arg_cache_default = arg
+      elif num_args == 3 and argv[1] == '-r' and not argv[2].startswith('-'):
+        self.arg_cache_raw = arg
+
     # Don't respect any of the other options here?  This is buffered I/O.
     if arg.line:  # read --line
       var_name, var_spid = arg_r.Peek2()
       if var_name is None:
         var_name = '_line'
       else:
-        if var_name.startswith(':'):  # optional : sigil
-          var_name = var_name[1:]
+        var_name = _VarName(var_name)
         arg_r.Next()
 
       next_arg, next_spid = arg_r.Peek2()
@@ -365,8 +427,7 @@ class Read(vm._Builtin):
       if var_name is None:
         var_name = '_all'
       else:
-        if var_name.startswith(':'):  # optional : sigil
-          var_name = var_name[1:]
+        var_name = _VarName(var_name)
         arg_r.Next()
 
       next_arg, next_spid = arg_r.Peek2()
@@ -421,6 +482,10 @@ class Read(vm._Builtin):
       # Did we read all the bytes we wanted?
       return 0 if len(s) == arg.n else 1
 
+    # Strip the optional : sigil exactly once, instead of re-checking each
+    # name in the assignment loop below.
+    names = [_VarName(n) for n in names]
+
     if len(names) == 0:
       names.append('REPLY')
 
@@ -443,13 +508,38 @@ class Read(vm._Builtin):
       else:
         delim_byte = pyos.NEWLINE_CH  # read a line
 
+    if raw and max_results == 1 and self.splitter.IsDefaultIFS():
+      # Fast path for the common 'read -r var' (and 'read -0 var'): with the
+      # default IFS and a single variable, splitting only strips leading and
+      # trailing IFS whitespace, and -r means there's no line continuation.
+      # Skip SplitForRead and _AppendParts entirely.
+      line, eof = _ReadUntilDelim(delim_byte, self.cmd_ev)
+
+      i = 0
+      n = len(line)
+      while i < n and line[i] in split.DEFAULT_IFS:
+        i += 1
+      j = n
+      while j > i and line[j - 1] in split.DEFAULT_IFS:
+        j -= 1
+
+      state.BuiltinSetString(self.mem, names[0], line[i:j])
+      return 1 if eof else 0
+
     # We have to read more than one line if there is a line continuation (and
     # it's not -r).
+    #
+    # Note on the pass structure: each line is read, then split into spans,
+    # then the spans are walked to fill parts.  Fusing these into a single
+    # scan would mean duplicating the IfsSplitter state machine here, and the
+    # read pass can't see past the delimiter anyway (input is unbuffered).
     parts = []  # type: List[mylib.BufWriter]
     join_next = False
     status = 0
+    splitter = self.splitter  # avoid attribute lookups in the loop
+    cmd_ev = self.cmd_ev
     while True:
-      line, eof = _ReadUntilDelim(delim_byte, self.cmd_ev)
+      line, eof = _ReadUntilDelim(delim_byte, cmd_ev)
 
       if eof:
         # status 1 to terminate loop.  (This is true even though we set
@@ -460,7 +550,7 @@ class Read(vm._Builtin):
       if len(line) == 0:
         break
 
-      spans = self.splitter.SplitForRead(line, not raw)
+      spans = splitter.SplitForRead(line, not raw)
       done, join_next = _AppendParts(line, spans, max_results, join_next, parts)
 
       #log('PARTS %s continued %s', parts, continued)
@@ -477,11 +567,8 @@ class Read(vm._Builtin):
           s = entries[i]
         else:
           s = ''  # if there are too many variables
-        var_name = names[i]
-        if var_name.startswith(':'):
-          var_name = var_name[1:]
-        #log('read: %s = %s', var_name, s)
-        state.BuiltinSetString(self.mem, var_name, s)
+        #log('read: %s = %s', names[i], s)
+        state.BuiltinSetString(self.mem, names[i], s)
 
     return status
 
@@ -504,8 +591,7 @@ class MapFile(vm._Builtin):
     if var_name is None:
       var_name = 'MAPFILE'
     else:
-     if var_name.startswith(':'):
-       var_name = var_name[1:]
+      var_name = _VarName(var_name)
 
     lines = []  # type: List[str]
     while True:
@@ -561,7 +647,6 @@ class Cd(vm._Builtin):
 
     dest_dir, arg_spid = arg_r.Peek2()
     if dest_dir is None:
-      val = self.mem.GetValue('HOME')
       try:
         dest_dir = state.GetString(self.mem, 'HOME')
       except error.Runtime as e:
@@ -629,17 +714,23 @@ def _PrintDirStack(dir_stack, style, home_dir):
   # type: (DirStack, int, Optional[str]) -> None
   """Helper for 'dirs'."""
 
+  # When there's no HOME (or dirs -l disabled it), PrettyDir is the identity,
+  # so don't call it per entry.
+  if home_dir is None:
+    entries = dir_stack.Iter()
+  else:
+    entries = [ui.PrettyDir(entry, home_dir) for entry in dir_stack.Iter()]
+
   if style == WITH_LINE_NUMBERS:
-    for i, entry in enumerate(dir_stack.Iter()):
-      print('%2d  %s' % (i, ui.PrettyDir(entry, home_dir)))
+    for i, entry in enumerate(entries):
+      print('%2d  %s' % (i, entry))
 
   elif style == WITHOUT_LINE_NUMBERS:
-    for entry in dir_stack.Iter():
-      print(ui.PrettyDir(entry, home_dir))
+    for entry in entries:
+      print(entry)
 
   elif style == SINGLE_LINE:
-    parts = [ui.PrettyDir(entry, home_dir) for entry in dir_stack.Iter()]
-    s = ' '.join(parts)
+    s = ' '.join(entries)
     print(s)
 
 
@@ -722,7 +813,7 @@ class Popd(vm._Builtin):
     if len(out_errs):
       return 1  # error
 
-    _PrintDirStack(self.dir_stack, SINGLE_LINE, state.MaybeString(self.mem, ('HOME')))
+    _PrintDirStack(self.dir_stack, SINGLE_LINE, state.MaybeString(self.mem, 'HOME'))
     return 0
 
 
@@ -793,13 +884,15 @@ class Help(vm._Builtin):
     # type: (_ResourceLoader, ErrorFormatter) -> None
     self.loader = loader
     self.errfmt = errfmt
+    self.groups = []  # type: List[str]  # cached by _Groups()
+    self.pages = {}  # type: Dict[str, str]  # topic -> contents
 
   def _Groups(self):
     # type: () -> List[str]
-    # TODO: cache this?
-    contents = self.loader.Get('_devbuild/help/groups.txt')
-    groups = contents.splitlines(False)  # no newlines
-    return groups
+    if len(self.groups) == 0:  # load on first use
+      contents = self.loader.Get('_devbuild/help/groups.txt')
+      self.groups = contents.splitlines(False)  # no newlines
+    return self.groups
 
   def Run(self, cmd_val):
     # type: (cmd_value__Argv) -> int
@@ -814,24 +907,29 @@ class Help(vm._Builtin):
     else:
       arg_r.Next()
 
-    try:
-      contents = self.loader.Get('_devbuild/help/%s' % topic)
-    except IOError:
-      # Notes:
-      # 1. bash suggests:
-      # man -k zzz
-      # info zzz
-      # help help
-      # We should do something smarter.
-
-      # 2. This also happens on 'build/dev.sh minimal', which isn't quite
-      # accurate.  We don't have an exact list of help topics!
-
-      # 3. This is mostly an interactive command.  Is it obnoxious to
-      # quote the line of code?
-      self.errfmt.Print_('no help topics match %r' % topic,
-                         span_id=blame_spid)
-      return 1
+    # Interactive sessions tend to ask for the same topics repeatedly; don't
+    # re-read the file each time.  Only successful loads are cached.
+    contents = self.pages.get(topic)
+    if contents is None:
+      try:
+        contents = self.loader.Get('_devbuild/help/%s' % topic)
+      except IOError:
+        # Notes:
+        # 1. bash suggests:
+        # man -k zzz
+        # info zzz
+        # help help
+        # We should do something smarter.
+
+        # 2. This also happens on 'build/dev.sh minimal', which isn't quite
+        # accurate.  We don't have an exact list of help topics!
+
+        # 3. This is mostly an interactive command.  Is it obnoxious to
+        # quote the line of code?
+        self.errfmt.Print_('no help topics match %r' % topic,
+                           span_id=blame_spid)
+        return 1
+      self.pages[topic] = contents
 
     print(contents)
     return 0
@@ -851,7 +949,9 @@ class Cat(vm._Builtin):
     # type: (cmd_value__Argv) -> int
     chunks = []  # type: List[str]
     while True:
-      n, err_num = pyos.Read(0, 4096, chunks)
+      # Stream in 64 KiB chunks rather than 4096-byte ones; this is a
+      # sequential drain like read --all.
+      n, err_num = pyos.Read(0, 65536, chunks)
 
       if n < 0:
         if err_num == EINTR:
@@ -170,6 +170,15 @@ class SplitContext(object):
 
     raise AssertionError('for -Wreturn-type in C++')
 
+  def IsDefaultIFS(self):
+    # type: () -> bool
+    """True if the current IFS is (or is equivalent to) the default ' \\t\\n'.
+
+    The 'read' builtin uses this to skip the splitter for 'read -r var'.
+    """
+    sp = self._GetSplitter()
+    return sp.ifs_whitespace == DEFAULT_IFS and len(sp.ifs_other) == 0
+
   def Escape(self, s):
     # type: (str) -> str
     """Escape IFS chars."""
@@ -5,9 +5,22 @@ split.test.py: Tests for split.py
 
 import unittest
 
+from _devbuild.gen.runtime_asdl import value
+from osh import builtin_misc
 from osh import split  # module under test
 
 
+class _FakeMem(object):
+  """Supports just the GetValue('IFS') call that SplitContext makes."""
+
+  def __init__(self, ifs_val):
+    self.ifs_val = ifs_val
+
+  def GetValue(self, name, which_scopes):
+    assert name == 'IFS'
+    return self.ifs_val
+
+
 def _RunSplitCases(test, sp, cases):
 
   for expected_parts, s, allow_escape in cases:
@@ -85,6 +98,72 @@ class SplitTest(unittest.TestCase):
 
     self.assertEqual(r'a\ _b', sp.Escape('a _b'))
 
+  def testIsDefaultIfs(self):
+    # Unset IFS means the default
+    ctx = split.SplitContext(_FakeMem(value.Undef()))
+    self.assertEqual(True, ctx.IsDefaultIFS())
+
+    ctx = split.SplitContext(_FakeMem(value.Str(split.DEFAULT_IFS)))
+    self.assertEqual(True, ctx.IsDefaultIFS())
+
+    # Same chars in a different order: equivalent for splitting, but the
+    # splitter is built in IFS-string order, so we conservatively answer
+    # False and 'read' takes the slow path.
+    ctx = split.SplitContext(_FakeMem(value.Str('\t \n')))
+    self.assertEqual(False, ctx.IsDefaultIFS())
+
+    # Non-whitespace IFS chars change the splits
+    ctx = split.SplitContext(_FakeMem(value.Str(' \t\n:')))
+    self.assertEqual(False, ctx.IsDefaultIFS())
+
+    ctx = split.SplitContext(_FakeMem(value.Str('')))
+    self.assertEqual(False, ctx.IsDefaultIFS())
+
+  def testReadFastPathEquivalence(self):
+    # The 'read -r var' fast path in osh/builtin_misc.py trims leading and
+    # trailing DEFAULT_IFS whitespace by hand instead of running the
+    # splitter.  Check it against SplitForRead + _AppendParts, which is what
+    # the slow path does with max_results=1.  It relies on the splitter
+    # emitting NO span for trailing whitespace (testTrailingWhitespaceBug).
+    # \r and \v are NOT IFS whitespace, so they must survive at either end.
+    CASES = [
+        '',
+        ' ',
+        ' \t\n',
+        'a',
+        ' a ',
+        '\t a \t b \n',
+        'a  b\tc',
+        '  leading',
+        'trailing  ',
+        '\ra\r',
+        '\va\v',
+        ' \r a \v b \r ',
+        'a b \r\v',
+    ]
+
+    ctx = split.SplitContext(_FakeMem(value.Undef()))
+    self.assertEqual(True, ctx.IsDefaultIFS())
+
+    for line in CASES:
+      spans = ctx.SplitForRead(line, False)  # allow_escape=False, like -r
+      parts = []
+      builtin_misc._AppendParts(line, spans, 1, False, parts)
+      slow = parts[0].getvalue() if len(parts) else ''
+
+      # The fast path's manual trim
+      i = 0
+      n = len(line)
+      while i < n and line[i] in split.DEFAULT_IFS:
+        i += 1
+      j = n
+      while j > i and line[j - 1] in split.DEFAULT_IFS:
+        j -= 1
+      fast = line[i:j]
+
+      self.assertEqual(slow, fast,
+          '%r: %r != %r' % (line, slow, fast))
+
   def testMixedIfs(self):
     CASES = [
         ([], '', True),